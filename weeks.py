@@ -1,24 +1,28 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 import time
 import os
 import smtplib
 import ssl
+import signal
+import asyncio
 from datetime import date, timedelta
+from pathlib import Path
 
 # --- ⚙️ CONFIGURATION - LOAD FROM FILE ⚙️ ---
 
 def load_config():
     """Load configuration from config.txt file."""
-    config = {}
     try:
-        with open('config.txt', 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#'):
-                    key, value = line.split('=', 1)
-                    config[key.strip()] = value.strip()
-        return config
+        text = Path('config.txt').read_text()
+        lines = (line.strip() for line in text.splitlines())
+        return dict(
+            tuple(part.strip() for part in line.split('=', 1))
+            for line in lines
+            if line and not line.startswith('#')
+        )
     except FileNotFoundError:
         print("❌ config.txt file not found! Please create it with your credentials.")
         return None
@@ -50,12 +54,40 @@ SEARCH_WITHIN_DAYS = 14 # Search for flights departing in the next 14 days
 # Script Settings
 CHECK_INTERVAL_SECONDS = 3600 # Check once per hour (3600 seconds)
 BEST_PRICE_FILE = "best_price.json"
+PRICE_CACHE_FILE = "price_cache.json"
+PRICE_CACHE_TTL_SECONDS = 10800 # Re-query a date pair once its cached price is 3 hours old (0 = every check)
+
+MAX_CONCURRENT_SEARCHES = 8 # Number of date pairs searched at the same time
+MAX_REQUESTS_PER_SECOND = 10 # Amadeus test environment rate limit
+RATE_LIMIT_RETRIES = 3 # Retries for a search rejected with HTTP 429
+REQUEST_TIMEOUT_SECONDS = 30 # Give up on a stalled HTTP request after this long
+SMTP_TIMEOUT_SECONDS = 30 # Give up on a stalled SMTP operation after this long
 
 # --- END OF CONFIGURATION ---
 
+# One keep-alive session shared by every request, so connections are reused
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    # 429s (even with Retry-After) are left to RateLimiter so all searches back off together
+    max_retries=Retry(
+        total=3,
+        read=0, # Don't retry a stalled read; it would delay a forced stop
+        backoff_factor=0.3,
+        status_forcelist=[500, 502, 503, 504],
+        respect_retry_after_header=False,
+    ),
+))
+
+_token_cache = {"token": None, "expires_at": 0.0}
+TOKEN_EXPIRY_MARGIN_SECONDS = 30 # Refresh the token this long before it expires
 
 def get_amadeus_access_token(api_key, api_secret):
-    """Get an access token from the Amadeus API."""
+    """Get an access token from the Amadeus API, reusing it until it is about to expire."""
+    if _token_cache["token"] and time.time() < _token_cache["expires_at"] - TOKEN_EXPIRY_MARGIN_SECONDS:
+        return _token_cache["token"]
+
     url = "https://test.api.amadeus.com/v1/security/oauth2/token"
     headers = {"Content-Type": "application/x-www-form-urlencoded"}
     data = {
@@ -64,71 +96,162 @@ def get_amadeus_access_token(api_key, api_secret):
         "client_secret": api_secret,
     }
     try:
-        response = requests.post(url, headers=headers, data=data)
+        response = SESSION.post(url, headers=headers, data=data, timeout=REQUEST_TIMEOUT_SECONDS)
         response.raise_for_status()
+        payload = response.json()
+        _token_cache["token"] = payload["access_token"]
+        _token_cache["expires_at"] = time.time() + payload.get("expires_in", 0)
         print("✅ Access token retrieved successfully.")
-        return response.json()["access_token"]
+        return _token_cache["token"]
     except requests.exceptions.RequestException as e:
         print(f"❌ Failed to get Amadeus access token: {e}")
         return None
 
-def find_cheapest_flight(token, origin, destination, start_date, end_date, trip_duration):
-    """Search for the cheapest nonstop flight for a fixed trip duration."""
-    cheapest_flight = None
-    
-    current_date = start_date
-    while current_date <= end_date:
-        departure_date = current_date.strftime("%Y-%m-%d")
-        return_date = (current_date + timedelta(days=trip_duration)).strftime("%Y-%m-%d")
-
-        print(f"🔎 Searching: {origin} -> {destination} from {departure_date} to {return_date} ({trip_duration}-day trip)")
-
-        url = "https://test.api.amadeus.com/v2/shopping/flight-offers"
-        params = {
-            "originLocationCode": origin,
-            "destinationLocationCode": destination,
-            "departureDate": departure_date,
-            "returnDate": return_date,
-            "adults": 1,
-            "nonStop": "true",
-            "currencyCode": "USD",
-            "max": 5, # We only need a few results to find the cheapest
-        }
-        headers = {"Authorization": f"Bearer {token}"}
+class RateLimitedError(Exception):
+    """Raised when Amadeus rejects a request with HTTP 429."""
 
-        try:
-            response = requests.get(url, headers=headers, params=params)
-            if response.status_code == 400: # Often means no flights found
-                current_date += timedelta(days=1)
-                continue
-            response.raise_for_status()
-            offers = response.json().get("data", [])
-            
-            if not offers:
-                current_date += timedelta(days=1)
-                continue
+    def __init__(self, retry_after):
+        super().__init__(f"rate limited (Retry-After: {retry_after})")
+        self.retry_after = retry_after
 
-            # Find the cheapest offer in this batch
-            current_best_offer = min(offers, key=lambda x: float(x["price"]["total"]))
-            current_price = float(current_best_offer["price"]["total"])
+class RateLimiter:
+    """Space out request starts and let a 429 pause every pending search."""
 
-            if cheapest_flight is None or current_price < cheapest_flight["price"]:
-                cheapest_flight = {
-                    "price": current_price,
-                    "departure_date": departure_date,
-                    "return_date": return_date,
-                    "link": f"https://www.google.com/flights?hl=en#flt={origin}.{destination}.{departure_date}*{destination}.{origin}.{return_date}"
-                }
-                print(f"✨ New best price found in this search: ${current_price:.2f}")
+    def __init__(self, requests_per_second):
+        self.interval = 1 / requests_per_second
+        self.next_slot = 0.0
+        self.paused_until = 0.0
 
-        except requests.exceptions.RequestException as e:
-            print(f"⚠️ API request failed for dates {departure_date} to {return_date}: {e}")
-        
-        time.sleep(0.3) # Short delay to respect API rate limits
+    async def wait(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            delay = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+            # A 429 seen while we slept pauses us too
+            if loop.time() >= self.paused_until:
+                return
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, asyncio.get_running_loop().time() + seconds)
+
+def search_date_pair(token, origin, destination, departure_date, return_date):
+    """Return the cheapest nonstop price for one departure/return pair, or None."""
+    print(f"🔎 Searching: {origin} -> {destination} from {departure_date} to {return_date}")
+
+    url = "https://test.api.amadeus.com/v2/shopping/flight-offers"
+    params = {
+        "originLocationCode": origin,
+        "destinationLocationCode": destination,
+        "departureDate": departure_date,
+        "returnDate": return_date,
+        "adults": 1,
+        "nonStop": "true",
+        "currencyCode": "USD",
+        "max": 5, # We only need a few results to find the cheapest
+    }
+    headers = {"Authorization": f"Bearer {token}"}
+
+    # Request errors propagate so failed searches are not cached as "no flights"
+    response = SESSION.get(url, headers=headers, params=params, timeout=REQUEST_TIMEOUT_SECONDS)
+    if response.status_code == 400: # Often means no flights found
+        return None
+    if response.status_code == 429:
+        try:
+            retry_after = float(response.headers.get("Retry-After", ""))
+        except ValueError:
+            retry_after = None
+        raise RateLimitedError(retry_after)
+    response.raise_for_status()
+    offers = response.json().get("data", [])
+    if not offers:
+        return None
 
-        current_date += timedelta(days=1)
+    # Find the cheapest offer in this batch, parsing each price only once
+    return min(float(offer["price"]["total"]) for offer in offers)
+
+def _cache_key(origin, destination, departure_date, return_date):
+    """Build the price cache key for one route and date pair."""
+    return f"{origin}:{destination}:{departure_date}:{return_date}"
+
+async def _fetch(semaphore, limiter, price_cache, token, origin, destination, departure_date, return_date):
+    """Search one date pair in a worker thread and store the result in the cache."""
+    async with semaphore:
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            await limiter.wait()
+            try:
+                price = await asyncio.to_thread(search_date_pair, token, origin, destination, departure_date, return_date)
+                break
+            except RateLimitedError as e:
+                if attempt == RATE_LIMIT_RETRIES:
+                    raise
+                # Honour Retry-After if given, otherwise back off exponentially
+                backoff = e.retry_after if e.retry_after is not None else 2 ** attempt
+                print(f"⏳ Rate limited, backing off for {backoff:.1f}s...")
+                limiter.pause(backoff)
+    price_cache[_cache_key(origin, destination, departure_date, return_date)] = {"ts": time.time(), "price": price}
+    return price
+
+async def find_cheapest_flight(token, origin, destination, start_date, end_date, trip_duration):
+    """Search for the cheapest nonstop flight for a fixed trip duration."""
+    # Format every date in the window once, then pair departures with returns
+    num_departures = (end_date - start_date).days + 1
+    dates = [(start_date + timedelta(days=d)).isoformat() for d in range(num_departures + trip_duration)]
+    date_pairs = [(dates[d], dates[d + trip_duration]) for d in range(num_departures)]
+
+    # Only query the API for unique pairs with no fresh cached price. The default
+    # TTL spans several check intervals, so most checks only search pairs that
+    # are new to the window or whose cached price has expired
+    price_cache = await asyncio.to_thread(load_price_cache)
+    keys = {pair: _cache_key(origin, destination, *pair) for pair in date_pairs}
+    now = time.time()
+    stale_pairs = [
+        pair for pair, key in keys.items()
+        if key not in price_cache or now - price_cache[key]["ts"] >= PRICE_CACHE_TTL_SECONDS
+    ]
+    if len(stale_pairs) < len(keys):
+        print(f"♻️ Reusing cached prices for {len(keys) - len(stale_pairs)} of {len(keys)} date pairs.")
+
+    # The searches are independent and I/O-bound, so run them concurrently
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_SEARCHES)
+    limiter = RateLimiter(MAX_REQUESTS_PER_SECOND)
+    tasks = [
+        _fetch(semaphore, limiter, price_cache, token, origin, destination, departure_date, return_date)
+        for departure_date, return_date in stale_pairs
+    ]
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    failed = {pair: result for pair, result in zip(stale_pairs, results) if isinstance(result, Exception)}
+    await asyncio.to_thread(save_price_cache, price_cache)
+
+    # Track the running best over fresh and cached prices, reporting failures
+    best_price = float('inf')
+    best_pair = None
+    for (departure_date, return_date), key in keys.items():
+        if (departure_date, return_date) in failed:
+            print(f"⚠️ API request failed for dates {departure_date} to {return_date}: {failed[(departure_date, return_date)]}")
+            continue
+        current_price = price_cache[key]["price"]
+        if current_price is not None and current_price < best_price:
+            best_price = current_price
+            best_pair = (departure_date, return_date)
+
+    if best_pair is None:
+        return None
 
-    return cheapest_flight
+    departure_date, return_date = best_pair
+    print(f"✨ Best price found in this search: ${best_price:.2f}")
+    return {
+        "price": best_price,
+        "departure_date": departure_date,
+        "return_date": return_date,
+        "link": f"https://www.google.com/flights?hl=en#flt={origin}.{destination}.{departure_date}*{destination}.{origin}.{return_date}"
+    }
 
 def send_email_notification(flight_info):
     """Send an email with the new cheapest flight details."""
@@ -148,7 +271,7 @@ def send_email_notification(flight_info):
 
     context = ssl.create_default_context()
     try:
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465, context=context) as server:
+        with smtplib.SMTP_SSL("smtp.gmail.com", 465, context=context, timeout=SMTP_TIMEOUT_SECONDS) as server:
             server.login(SENDER_EMAIL, EMAIL_APP_PASSWORD)
             server.sendmail(SENDER_EMAIL, RECEIVER_EMAIL, message)
         print(f"Email notification sent successfully to {RECEIVER_EMAIL}!")
@@ -167,46 +290,121 @@ def save_best_price(flight_info):
     with open(BEST_PRICE_FILE, "w") as f:
         json.dump(flight_info, f)
 
+def load_price_cache():
+    """Load cached per-date-pair prices from a file."""
+    # The cache is only an optimization: a missing or corrupt file means an empty cache
+    try:
+        with open(PRICE_CACHE_FILE, "r") as f:
+            price_cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(price_cache, dict):
+        return {}
+    # Drop malformed entries so they are simply searched again
+    return {
+        key: entry for key, entry in price_cache.items()
+        if isinstance(entry, dict)
+        and isinstance(entry.get("ts"), (int, float))
+        and "price" in entry
+    }
+
+def save_price_cache(price_cache):
+    """Save the price cache to a file, dropping expired entries."""
+    now = time.time()
+    fresh = {key: entry for key, entry in price_cache.items() if now - entry["ts"] < PRICE_CACHE_TTL_SECONDS}
+    # Write to a temp file and swap it in, so an interrupted write can't corrupt the cache
+    tmp_file = PRICE_CACHE_FILE + ".tmp"
+    try:
+        with open(tmp_file, "w") as f:
+            json.dump(fresh, f)
+        os.replace(tmp_file, PRICE_CACHE_FILE)
+    except OSError as e:
+        print(f"⚠️ Could not save price cache: {e}")
 
-def main():
+
+async def run_check(all_time_best):
+    """Run a single price check and return the (possibly updated) all-time best."""
+    print("\n" + "="*50)
+    print(f"Running new check at {time.ctime()}")
+
+    # Tokens expire after ~30 minutes, so refresh between hourly checks
+    access_token = await asyncio.to_thread(get_amadeus_access_token, AMADEUS_API_KEY, AMADEUS_API_SECRET)
+    if not access_token:
+        print("Skipping this check.")
+        return all_time_best
+
+    print(f"Current all-time best price: ${all_time_best['price']:.2f}")
+
+    search_start_date = date.today() + timedelta(days=1)
+    search_end_date = date.today() + timedelta(days=SEARCH_WITHIN_DAYS)
+
+    current_cheapest = await find_cheapest_flight(
+        access_token,
+        ORIGIN_CITY_CODE,
+        DESTINATION_CITY_CODE,
+        search_start_date,
+        search_end_date,
+        TRIP_DURATION_DAYS
+    )
+
+    if current_cheapest and current_cheapest["price"] < all_time_best["price"]:
+        print("🎉🎉🎉 NEW ALL-TIME BEST PRICE FOUND! 🎉🎉🎉")
+        print(f"Price: ${current_cheapest['price']:.2f}, Dates: {current_cheapest['departure_date']} to {current_cheapest['return_date']}")
+        # Disk and SMTP I/O run in worker threads so they don't block the event loop
+        await asyncio.to_thread(save_best_price, current_cheapest)
+        await asyncio.to_thread(send_email_notification, current_cheapest)
+        return current_cheapest
+    elif current_cheapest:
+        print(f"✅ Search complete. The cheapest price found this round was ${current_cheapest['price']:.2f}. Not better than the all-time best.")
+    else:
+        print("🤷 No flights found in the given date range for this check.")
+    return all_time_best
+
+async def main():
     """Main function to run the flight checker loop."""
     print("🚀 Starting Flight Price Checker...")
-    access_token = get_amadeus_access_token(AMADEUS_API_KEY, AMADEUS_API_SECRET)
+    access_token = await asyncio.to_thread(get_amadeus_access_token, AMADEUS_API_KEY, AMADEUS_API_SECRET)
     if not access_token:
         print("Stopping script due to authentication failure.")
         return
 
-    while True:
-        print("\n" + "="*50)
-        print(f"Running new check at {time.ctime()}")
-        
-        all_time_best = load_best_price()
-        print(f"Current all-time best price: ${all_time_best['price']:.2f}")
-
-        search_start_date = date.today() + timedelta(days=1)
-        search_end_date = date.today() + timedelta(days=SEARCH_WITHIN_DAYS)
-
-        current_cheapest = find_cheapest_flight(
-            access_token,
-            ORIGIN_CITY_CODE,
-            DESTINATION_CITY_CODE,
-            search_start_date,
-            search_end_date,
-            TRIP_DURATION_DAYS
-        )
+    # Stop cleanly on Ctrl+C / SIGTERM: let a running check finish, then exit.
+    # A second signal cancels the check instead of waiting for it. asyncio.run()
+    # still waits for HTTP calls already running in worker threads. A stalled
+    # read ends after REQUEST_TIMEOUT_SECONDS, but failed connects and 5xx
+    # responses may be retried up to 3 times first.
+    loop = asyncio.get_running_loop()
+    stop_event = asyncio.Event()
+    main_task = asyncio.current_task()
+
+    def request_stop():
+        if stop_event.is_set():
+            main_task.cancel()
+            return
+        print("🛑 Stop requested, finishing the current check (signal again to force)...")
+        stop_event.set()
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, request_stop)
+        except NotImplementedError: # Not supported on Windows
+            pass
 
-        if current_cheapest and current_cheapest["price"] < all_time_best["price"]:
-            print("🎉🎉🎉 NEW ALL-TIME BEST PRICE FOUND! 🎉🎉🎉")
-            print(f"Price: ${current_cheapest['price']:.2f}, Dates: {current_cheapest['departure_date']} to {current_cheapest['return_date']}")
-            save_best_price(current_cheapest)
-            send_email_notification(current_cheapest)
-        elif current_cheapest:
-            print(f"✅ Search complete. The cheapest price found this round was ${current_cheapest['price']:.2f}. Not better than the all-time best.")
-        else:
-            print("🤷 No flights found in the given date range for this check.")
+    # Only this process writes the file, so read it once and track it in memory
+    all_time_best = await asyncio.to_thread(load_best_price)
 
-        print(f"Waiting for {CHECK_INTERVAL_SECONDS / 60:.0f} minutes until the next check...")
-        time.sleep(CHECK_INTERVAL_SECONDS)
+    try:
+        while not stop_event.is_set():
+            all_time_best = await run_check(all_time_best)
+            print(f"Waiting for {CHECK_INTERVAL_SECONDS / 60:.0f} minutes until the next check...")
+            try:
+                # Wake up early if a stop is requested instead of sleeping blindly
+                await asyncio.wait_for(stop_event.wait(), timeout=CHECK_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+    except asyncio.CancelledError:
+        print("⚠️ Forced stop, abandoning the current check.")
+    print("👋 Stopping Flight Price Checker.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())